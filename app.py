@@ -1,11 +1,21 @@
 import streamlit as st
-import boto3
+import botocore.session
+import httpx
+import asyncio
+import json
+import mmap
+import random
+import threading
+from botocore.auth import SigV4Auth
+from botocore.awsrequest import AWSRequest
+from botocore.exceptions import NoCredentialsError
 from PIL import Image
 import io
-import base64
+import pybase64 as base64
 import os
 from pathlib import Path
 from typing import Tuple, Union
+from urllib.parse import quote
 
 # Constants
 MODEL_ID = "us.meta.llama3-2-90b-instruct-v1:0"
@@ -13,6 +23,18 @@ DEFAULT_PAYMENT_PROMPT = """Extract only the date and amount from this image. Da
 Date: dd/mm/yyyy
 Amount: xxx THB"""
 MAX_IMAGE_SIZE = 1120  # Llama 3.2 Vision maximum image size
+JPEG_QUALITY = 85  # Quality for resized model input; far smaller than PNG with no accuracy loss
+PREPROCESS_CACHE_ENTRIES = 32  # Processed uploads kept in memory, shared by all sessions
+PREPROCESS_CACHE_TTL = 3600  # Seconds before a processed upload is evicted
+# Concurrent Bedrock connections; the calls are I/O-bound, so allow several per core
+BEDROCK_MAX_PARALLEL = int(os.getenv("BEDROCK_MAX_PARALLEL", (os.cpu_count() or 1) * 5))
+BEDROCK_TIMEOUT = 60.0  # Seconds; matches botocore's default read timeout
+BEDROCK_MAX_RETRIES = 4  # Retries after the first attempt, as in botocore's legacy retry mode
+BEDROCK_MAX_BACKOFF = 20.0  # Seconds; cap on the jittered exponential backoff
+BEDROCK_RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+# Pillow formats Converse accepts as-is, mapped to its format names; MPO is a JPEG with
+# extra frames appended, which decoders ignore. Anything else is re-encoded as JPEG.
+BEDROCK_IMAGE_FORMATS = {'JPEG': 'jpeg', 'MPO': 'jpeg', 'PNG': 'png', 'GIF': 'gif', 'WEBP': 'webp'}
 
 # Initialize session state for storing the prompt
 if 'payment_prompt' not in st.session_state:
@@ -25,7 +47,286 @@ if 'aws_credentials' in st.secrets:
     os.environ['AWS_SECRET_ACCESS_KEY'] = credentials['aws_secret_access_key']
     os.environ['AWS_DEFAULT_REGION'] = credentials['aws_region']
 
+# Resize filter, configurable via the RESAMPLE_FILTER env var or Streamlit secret.
+# BICUBIC is visually indistinguishable from LANCZOS for model input and cheaper.
+# Only the separable filters are accepted, so both resize backends support every choice.
+RESAMPLE_FILTERS = {
+    'bilinear': Image.BILINEAR,
+    'bicubic': Image.BICUBIC,
+    'lanczos': Image.LANCZOS,
+}
+if 'resample_filter' in st.secrets:
+    os.environ.setdefault('RESAMPLE_FILTER', st.secrets['resample_filter'])
+resample_filter_name = os.environ.get('RESAMPLE_FILTER', 'bicubic').lower()
+if resample_filter_name not in RESAMPLE_FILTERS:
+    raise ValueError(
+        f"Unknown RESAMPLE_FILTER {resample_filter_name!r}; expected one of {', '.join(RESAMPLE_FILTERS)}"
+    )
+RESAMPLE_FILTER = RESAMPLE_FILTERS[resample_filter_name]
+
+# Resize backend, configurable via the RESIZE_BACKEND env var or Streamlit secret.
+# 'numba' is opt-in: it is slower than Pillow on most machines and pays a JIT compile
+# on first use, but runs a parallel convolution where Pillow-SIMD is unavailable.
+RESIZE_BACKENDS = ('pillow', 'numba')
+if 'resize_backend' in st.secrets:
+    os.environ.setdefault('RESIZE_BACKEND', st.secrets['resize_backend'])
+RESIZE_BACKEND = os.environ.get('RESIZE_BACKEND', 'pillow').lower()
+if RESIZE_BACKEND not in RESIZE_BACKENDS:
+    raise ValueError(f"Unknown RESIZE_BACKEND {RESIZE_BACKEND!r}; expected one of {', '.join(RESIZE_BACKENDS)}")
+
+if RESIZE_BACKEND == 'numba':
+    try:
+        import numba
+        import numpy as np
+    except ImportError as e:
+        raise ImportError("RESIZE_BACKEND=numba requires the numba and numpy packages") from e
+
+    def _bilinear_kernel(x):
+        return np.maximum(1.0 - np.abs(x), 0.0)
+
+    def _bicubic_kernel(x, a=-0.5):
+        x = np.abs(x)
+        return np.where(
+            x < 1.0, ((a + 2.0) * x - (a + 3.0)) * x * x + 1.0,
+            np.where(x < 2.0, (((x - 5.0) * x + 8.0) * x - 4.0) * a, 0.0)
+        )
+
+    def _lanczos_kernel(x):
+        return np.where(np.abs(x) < 3.0, np.sinc(x) * np.sinc(x / 3.0), 0.0)
+
+    # Filter -> (support, kernel), matching Pillow's separable resample filters
+    RESAMPLE_KERNELS = {
+        Image.BILINEAR: (1.0, _bilinear_kernel),
+        Image.BICUBIC: (2.0, _bicubic_kernel),
+        Image.LANCZOS: (3.0, _lanczos_kernel),
+    }
+
+    def _resample_coeffs(in_size: int, out_size: int, resample: int) -> Tuple["np.ndarray", "np.ndarray", "np.ndarray"]:
+        """
+        Precompute the banded coefficient matrix for one resample axis.
+        
+        Args:
+            in_size (int): Input length along the axis
+            out_size (int): Output length along the axis
+            resample (int): PIL resample filter
+            
+        Returns:
+            tuple: (first input index, tap count and coefficients of shape (out_size, max taps) per output)
+        """
+        support, kernel = RESAMPLE_KERNELS[resample]
+        scale = in_size / out_size
+        filterscale = max(scale, 1.0)
+        support *= filterscale
+
+        centers = (np.arange(out_size) + 0.5) * scale
+        starts = np.clip((centers - support + 0.5).astype(np.int64), 0, in_size)
+        ends = np.clip((centers + support + 0.5).astype(np.int64), 0, in_size)
+        counts = ends - starts
+
+        taps = starts[:, None] + np.arange(counts.max())[None, :]
+        coeffs = kernel((taps + 0.5 - centers[:, None]) / filterscale)
+        coeffs[taps >= ends[:, None]] = 0.0
+        coeffs /= coeffs.sum(axis=1, keepdims=True)
+        return starts, counts, coeffs
+
+    def _resample_horizontal(src, starts, counts, coeffs):
+        channels = src.shape[2]
+        out = np.empty((src.shape[0], starts.shape[0], channels), dtype=np.uint8)
+        for y in numba.prange(src.shape[0]):
+            for x in range(starts.shape[0]):
+                first = starts[x]
+                for ch in range(channels):
+                    acc = 0.5
+                    for k in range(counts[x]):
+                        acc += coeffs[x, k] * src[y, first + k, ch]
+                    out[y, x, ch] = 0 if acc < 0.0 else (255 if acc >= 255.0 else np.uint8(acc))
+        return out
+
+    def _resample_vertical(src, starts, counts, coeffs):
+        width, channels = src.shape[1], src.shape[2]
+        out = np.empty((starts.shape[0], width, channels), dtype=np.uint8)
+        for y in numba.prange(starts.shape[0]):
+            # Accumulate whole input rows so every tap reads contiguous memory
+            acc = np.full((width, channels), 0.5)
+            for k in range(counts[y]):
+                c = coeffs[y, k]
+                row = src[starts[y] + k]
+                for x in range(width):
+                    for ch in range(channels):
+                        acc[x, ch] += c * row[x, ch]
+            for x in range(width):
+                for ch in range(channels):
+                    v = acc[x, ch]
+                    out[y, x, ch] = 0 if v < 0.0 else (255 if v >= 255.0 else np.uint8(v))
+        return out
+
+    @st.cache_resource
+    def init_resize_kernels():
+        """
+        JIT the resample kernels once per process, with the lock that serializes their launches.
+        
+        Streamlit re-executes the script on every rerun, so module-level dispatchers and locks
+        would be rebuilt per run. numba's fallback workqueue threading layer aborts the process
+        on concurrent parallel launches, so the lock must be shared by every session.
+        
+        Returns:
+            tuple: (horizontal kernel, vertical kernel, launch lock)
+        """
+        jit = numba.njit(parallel=True, cache=True)
+        return jit(_resample_horizontal), jit(_resample_vertical), threading.Lock()
+
+    def resize_numba(img_np: "np.ndarray", out_h: int, out_w: int, resample: int = Image.LANCZOS) -> "np.ndarray":
+        """
+        Resize an image array with a separable convolution over precomputed coefficient bands.
+        
+        Passes run horizontal then vertical with the intermediate rounded to uint8, as Pillow does.
+        
+        Args:
+            img_np (np.ndarray): uint8 image array of shape (H, W) or (H, W, C)
+            out_h (int): Output height
+            out_w (int): Output width
+            resample (int): PIL resample filter (BILINEAR, BICUBIC or LANCZOS)
+            
+        Returns:
+            np.ndarray: Resized uint8 image array with the same number of dimensions
+        """
+        src = img_np.reshape(img_np.shape[0], img_np.shape[1], -1)
+        h_coeffs = _resample_coeffs(src.shape[1], out_w, resample)
+        v_coeffs = _resample_coeffs(src.shape[0], out_h, resample)
+        resample_horizontal, resample_vertical, lock = init_resize_kernels()
+        with lock:
+            out = resample_horizontal(src, *h_coeffs)
+            out = resample_vertical(out, *v_coeffs)
+        return out.reshape((out_h, out_w) + img_np.shape[2:])
+
 class ImageUtils:
+    @staticmethod
+    def open_image(image_bytes: bytes) -> Image.Image:
+        """
+        Open image bytes once for format detection, validation and resizing.
+        
+        Args:
+            image_bytes (bytes): Raw image bytes
+            
+        Returns:
+            Image.Image: Lazily decoded image
+            
+        Raises:
+            ValueError: If the bytes are not a recognised image
+        """
+        try:
+            return Image.open(io.BytesIO(image_bytes))
+        except Exception as e:
+            raise ValueError("Invalid image file. Please upload a valid image.") from e
+
+    @staticmethod
+    def resize_image(img: Image.Image, max_size: int = MAX_IMAGE_SIZE) -> Image.Image:
+        """
+        Resize an opened image to fit within max_size while maintaining aspect ratio.
+        
+        Decoding happens here, so truncated or corrupt image data raises.
+        
+        Args:
+            img (Image.Image): Image returned by open_image
+            max_size (int): Maximum dimension size (default 1120 for Llama 3.2)
+            
+        Returns:
+            Image.Image: Resized image
+        """
+        if RESIZE_BACKEND == 'numba':
+            return ImageUtils.resize_image_numba(img, max_size)
+        
+        # Pillow resizes palette and bilevel images with NEAREST whatever filter is
+        # requested, so convert them first to keep receipt text anti-aliased
+        if img.mode == 'P':
+            img = img.convert('RGBA' if 'transparency' in img.info else 'RGB')
+        elif img.mode == '1':
+            img = img.convert('L')
+        
+        # thumbnail keeps the aspect ratio, uses draft() to decode JPEGs at a
+        # reduced scale and box-reduces before the final resample pass
+        img.thumbnail((max_size, max_size), RESAMPLE_FILTER, reducing_gap=2.0)
+        return img
+
+    @staticmethod
+    def resize_image_numba(img: Image.Image, max_size: int = MAX_IMAGE_SIZE) -> Image.Image:
+        """
+        Resize an opened image with the numba resize path, maintaining aspect ratio.
+        
+        Args:
+            img (Image.Image): Image returned by open_image
+            max_size (int): Maximum dimension size (default 1120 for Llama 3.2)
+            
+        Returns:
+            Image.Image: Resized image
+        """
+        width, height = img.size
+        scale = min(1.0, max_size / max(width, height))
+        new_width = max(1, round(width * scale))
+        new_height = max(1, round(height * scale))
+        
+        # Let libjpeg decode at a reduced DCT scale that still leaves at least 2x the
+        # target, the same reducing gap Image.thumbnail uses on the Pillow path
+        img.draft(None, (2 * new_width, 2 * new_height))
+        if img.mode not in ('L', 'RGB', 'RGBA'):
+            img = img.convert('RGBA' if 'A' in img.mode or 'transparency' in img.info else 'RGB')
+        
+        mode = img.mode
+        if mode == 'RGBA':
+            # Filter alpha premultiplied so the colour of transparent pixels doesn't
+            # bleed into the visible edges; like Pillow, skip the box-reduce for it
+            img = img.convert('RGBa')
+        else:
+            # Box-reduce by an integer factor that still leaves at least 2x the target,
+            # so the convolution only filters the final, non-integer step
+            factor = max(img.size) // (2 * max(new_width, new_height))
+            if factor > 1:
+                img = img.reduce(factor)
+        
+        resized = resize_numba(np.asarray(img), new_height, new_width, RESAMPLE_FILTER)
+        return Image.fromarray(resized, mode=img.mode).convert(mode)
+
+    @staticmethod
+    def encode_jpeg(img: Image.Image) -> bytes:
+        """
+        Encode an image as JPEG, flattening any transparency onto white.
+        
+        Args:
+            img (Image.Image): Image to encode
+            
+        Returns:
+            bytes: JPEG encoded image bytes
+        """
+        buffer = io.BytesIO()
+        if img.mode == 'P':
+            img = img.convert('RGBA' if 'transparency' in img.info else 'RGB')
+        if img.mode in ('RGBA', 'LA'):
+            background = Image.new('RGB', img.size, 'white')
+            background.paste(img, mask=img.getchannel('A'))
+            img = background
+        elif img.mode not in ('RGB', 'L'):
+            img = img.convert('RGB')
+        img.save(buffer, format='JPEG', quality=JPEG_QUALITY, optimize=False)
+        return buffer.getvalue()
+
+    @staticmethod
+    def resize_bytes(image_bytes: bytes, max_size: int = MAX_IMAGE_SIZE) -> bytes:
+        """
+        Resize raw image bytes to fit within max_size while maintaining aspect ratio.
+        
+        Args:
+            image_bytes (bytes): Raw image bytes
+            max_size (int): Maximum dimension size (default 1120 for Llama 3.2)
+            
+        Returns:
+            bytes: Resized JPEG image bytes, or the input bytes if already within max_size
+                and in a format Bedrock accepts
+            
+        Raises:
+            ValueError: If the bytes are not a valid image
+        """
+        return ImageUtils.process_image_bytes(image_bytes, max_size=max_size)[0]
+
     @staticmethod
     def resize_img(b64imgstr: str, max_size: int = MAX_IMAGE_SIZE) -> str:
         """
@@ -38,30 +339,8 @@ class ImageUtils:
         Returns:
             str: Base64 encoded resized image
         """
-        buffer = io.BytesIO()
-        img = base64.b64decode(b64imgstr)
-        img = Image.open(io.BytesIO(img))
-        
-        # Calculate new size maintaining aspect ratio
-        width, height = img.size
-        if width > height:
-            if width > max_size:
-                new_width = max_size
-                new_height = int((height * max_size) / width)
-            else:
-                new_width = width
-                new_height = height
-        else:
-            if height > max_size:
-                new_height = max_size
-                new_width = int((width * max_size) / height)
-            else:
-                new_width = width
-                new_height = height
-                
-        rimg = img.resize((new_width, new_height), Image.LANCZOS)
-        rimg.save(buffer, format=img.format)
-        return base64.b64encode(buffer.getvalue()).decode("utf-8")
+        resized = ImageUtils.resize_bytes(base64.b64decode(b64imgstr), max_size)
+        return base64.b64encode(resized).decode("utf-8")
 
     @staticmethod
     def img2base64(image_path: Union[str, Path], resize: bool = False) -> str:
@@ -76,79 +355,136 @@ class ImageUtils:
             str: Base64 encoded image
         """
         with open(image_path, "rb") as img_f:
-            img_data = base64.b64encode(img_f.read())
-        
-        if resize:
-            return ImageUtils.resize_img(img_data.decode())
-        else:
-            return img_data.decode()
+            if resize:
+                # Resize the raw bytes and encode only the (smaller) result
+                return base64.b64encode(ImageUtils.resize_bytes(img_f.read())).decode()
+            
+            if os.fstat(img_f.fileno()).st_size == 0:
+                return ""
+            # Encode straight from the page cache instead of copying the file into memory
+            with mmap.mmap(img_f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                return base64.b64encode(mm).decode()
 
     @staticmethod
-    def process_image_bytes(image_bytes: bytes, resize: bool = True) -> Tuple[bytes, str]:
+    def process_image_bytes(image_bytes: bytes, resize: bool = True,
+                            max_size: int = MAX_IMAGE_SIZE) -> Tuple[bytes, str]:
         """
-        Process image bytes - optionally resize and detect format.
+        Validate, detect format and optionally resize image bytes from a single open.
         
         Args:
             image_bytes (bytes): Raw image bytes
             resize (bool): Whether to resize the image
+            max_size (int): Maximum dimension size (default 1120 for Llama 3.2)
             
         Returns:
-            tuple: (processed image bytes, image format)
+            tuple: (processed image bytes, Bedrock image format); resized images and
+                formats Bedrock doesn't accept are encoded as JPEG, other images are
+                returned as-is
+            
+        Raises:
+            ValueError: If the bytes are not a valid image
         """
+        img = ImageUtils.open_image(image_bytes)
+        image_format = BEDROCK_IMAGE_FORMATS.get(img.format)
+        
         try:
-            # Try using PIL to determine format
-            img = Image.open(io.BytesIO(image_bytes))
-            image_format = img.format.lower() if img.format else 'png'
-        except Exception:
-            # Default to PNG if format detection fails
-            image_format = 'png'
-
-        if resize:
-            # Convert to base64, resize, and back to bytes
-            b64_str = base64.b64encode(image_bytes).decode()
-            resized_b64 = ImageUtils.resize_img(b64_str)
-            return base64.b64decode(resized_b64), image_format
+            if resize and max(img.size) > max_size:
+                # Decoding the pixel data validates the image; close both images
+                # once encoded to drop the decoded pixel buffers
+                with ImageUtils.resize_image(img, max_size) as rimg:
+                    return ImageUtils.encode_jpeg(rimg), 'jpeg'
+            
+            # Nothing to resize: decode the (small) image to validate it, then pass
+            # the bytes through if Bedrock can read them
+            img.load()
+            if image_format is None:
+                return ImageUtils.encode_jpeg(img), 'jpeg'
+        except Exception as e:
+            raise ValueError("Invalid image file. Please upload a valid image.") from e
+        finally:
+            img.close()
         
         return image_bytes, image_format
 
-    @staticmethod
-    def validate_image(image_bytes: bytes) -> bool:
-        """
-        Validate if the bytes represent a valid image.
+@st.cache_data(show_spinner=False, max_entries=PREPROCESS_CACHE_ENTRIES, ttl=PREPROCESS_CACHE_TTL)
+def preprocess(image_bytes: bytes) -> Tuple[bytes, str]:
+    """
+    Validate and resize an upload, memoized on its content across reruns.
+    
+    Args:
+        image_bytes (bytes): Raw image bytes
         
-        Args:
-            image_bytes (bytes): Raw image bytes
-            
-        Returns:
-            bool: True if valid image, False otherwise
-        """
-        try:
-            img = Image.open(io.BytesIO(image_bytes))
-            img.verify()
-            return True
-        except Exception:
-            return False
-
-def init_bedrock_client():
-    """Initialize Amazon Bedrock client with credentials."""
-    return boto3.client(
-        "bedrock-runtime",
-        aws_access_key_id=os.environ.get('AWS_ACCESS_KEY_ID'),
-        aws_secret_access_key=os.environ.get('AWS_SECRET_ACCESS_KEY'),
-        region_name=os.environ.get('AWS_DEFAULT_REGION')
-    )
+    Returns:
+        tuple: (processed image bytes, image format)
+    """
+    return ImageUtils.process_image_bytes(image_bytes, resize=True)
 
-def process_image_with_bedrock(client, image_bytes: bytes, image_format: str):
+def bedrock_region() -> str:
+    """Return the configured AWS region for Bedrock."""
+    region = os.environ.get('AWS_DEFAULT_REGION')
+    if not region:
+        raise ValueError("AWS region is not configured. Set AWS_DEFAULT_REGION or aws_credentials.aws_region.")
+    return region
+
+@st.cache_resource
+def init_bedrock_signer() -> SigV4Auth:
+    """Initialize a SigV4 signer for Amazon Bedrock with credentials resolved once."""
+    credentials = botocore.session.get_session().get_credentials()
+    if credentials is None:
+        raise NoCredentialsError()
+    # Refreshable credentials are re-read on every add_auth call
+    return SigV4Auth(credentials, "bedrock", bedrock_region())
+
+@st.cache_resource
+def init_event_loop() -> asyncio.AbstractEventLoop:
+    """Start the process-wide event loop that runs Bedrock I/O on a background thread."""
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, name="bedrock-io", daemon=True).start()
+    return loop
+
+def run_on_event_loop(coro):
     """
-    Process image with Amazon Bedrock API.
+    Run a coroutine on the shared Bedrock event loop and wait for its result.
+    
+    The coroutine runs outside the Streamlit script thread, so it must not call st.* APIs.
+    """
+    return asyncio.run_coroutine_threadsafe(coro, init_event_loop()).result()
+
+@st.cache_resource
+def init_http_client() -> httpx.AsyncClient:
+    """
+    Create the process-wide pooled HTTP/2 client for Bedrock requests.
+    
+    The client is created on the shared event loop and reused across reruns and
+    sessions, so connections stay alive between Extract clicks.
+    """
+    async def create_client() -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            http2=True,
+            timeout=BEDROCK_TIMEOUT,
+            limits=httpx.Limits(max_connections=BEDROCK_MAX_PARALLEL)
+        )
+    return run_on_event_loop(create_client())
+
+async def process_image_with_bedrock(client: httpx.AsyncClient, signer: SigV4Auth, image_bytes: bytes, image_format: str, prompt: str) -> str:
+    """
+    Process image with the Amazon Bedrock Converse API over a SigV4-signed request.
+    
+    Throttling, 5xx responses and transport errors are retried with exponential
+    backoff and full jitter, up to BEDROCK_MAX_RETRIES times.
     
     Args:
-        client: Bedrock client instance
+        client (httpx.AsyncClient): HTTP client from init_http_client
+        signer (SigV4Auth): Signer from init_bedrock_signer
         image_bytes (bytes): Processed image bytes
         image_format (str): Image format (e.g., 'png', 'jpeg')
+        prompt (str): Prompt sent along with the image
         
     Returns:
         str: API response text
+        
+    Raises:
+        RuntimeError: If Bedrock returns an error response
     """
     messages = [
         {
@@ -158,26 +494,38 @@ def process_image_with_bedrock(client, image_bytes: bytes, image_format: str):
                     "image": {
                         "format": image_format,
                         "source": {
-                            "bytes": image_bytes
+                            "bytes": base64.b64encode(image_bytes).decode()
                         }
                     }
                 },
                 {
-                    "text": st.session_state.payment_prompt  # Use the prompt from session state
+                    "text": prompt
                 }
             ]
         }
     ]
     
-    try:
-        response = client.converse(
-            modelId=MODEL_ID,
-            messages=messages
-        )
-        return response["output"]["message"]["content"][0]["text"]
-    except Exception as e:
-        st.error(f"API Error: {str(e)}")
-        return None
+    url = f"https://bedrock-runtime.{bedrock_region()}.amazonaws.com/model/{quote(MODEL_ID, safe='')}/converse"
+    body = json.dumps({"messages": messages})
+    
+    for attempt in range(BEDROCK_MAX_RETRIES + 1):
+        # Sign every attempt so retries carry a fresh timestamp and credentials
+        request = AWSRequest(method="POST", url=url, data=body, headers={"Content-Type": "application/json"})
+        signer.add_auth(request)
+        
+        try:
+            response = await client.post(url, content=body, headers=dict(request.headers))
+        except httpx.TransportError:
+            if attempt == BEDROCK_MAX_RETRIES:
+                raise
+        else:
+            if response.status_code not in BEDROCK_RETRY_STATUSES or attempt == BEDROCK_MAX_RETRIES:
+                break
+        await asyncio.sleep(random.uniform(0, min(BEDROCK_MAX_BACKOFF, 2 ** attempt)))
+    
+    if response.is_error:
+        raise RuntimeError(f"{response.status_code} {response.text}")
+    return response.json()["output"]["message"]["content"][0]["text"]
 
 def show_config():
     """Show configuration sidebar."""
@@ -214,27 +562,35 @@ def main():
     
     if uploaded_file is not None:
         try:
-            # Read image bytes
-            image_bytes = uploaded_file.read()
+            # Take the upload's buffer as-is; getvalue() does not depend on the read position
+            image_bytes = uploaded_file.getvalue()
             
-            # Validate image
-            if not ImageUtils.validate_image(image_bytes):
-                st.error("Invalid image file. Please upload a valid image.")
+            # Validate and process image with Llama 3.2 Vision size limit (1120x1120)
+            try:
+                processed_bytes, image_format = preprocess(image_bytes)
+            except ValueError as e:
+                st.error(str(e))
                 return
             
-            # Display original image
-            image = Image.open(io.BytesIO(image_bytes))
-            st.image(image, caption='Uploaded Image', use_column_width=True)
+            # Only the processed bytes are needed from here on
+            del image_bytes
             
-            # Process image with Llama 3.2 Vision size limit (1120x1120)
-            processed_bytes, image_format = ImageUtils.process_image_bytes(image_bytes, resize=True)
+            # Display the resized image: it is what the model sees and is smaller to send to the browser
+            st.image(processed_bytes, caption='Uploaded Image', use_column_width=True)
             
             if st.button('Extract Payment Information'):
                 try:
-                    client = init_bedrock_client()
+                    signer = init_bedrock_signer()
+                    client = init_http_client()
                     
                     with st.spinner('Extracting payment information...'):
-                        result = process_image_with_bedrock(client, processed_bytes, image_format)
+                        try:
+                            result = run_on_event_loop(process_image_with_bedrock(
+                                client, signer, processed_bytes, image_format, st.session_state.payment_prompt
+                            ))
+                        except Exception as e:
+                            st.error(f"API Error: {str(e)}")
+                            result = None
                         
                         if result:
                             st.subheader("Payment Details:")
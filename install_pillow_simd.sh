@@ -0,0 +1,12 @@
+#!/usr/bin/env sh
+# Install the app requirements, then replace stock Pillow with an AVX2 build of pillow-simd.
+# streamlit depends on pillow, so both would otherwise share the PIL package and the last
+# install wins. Re-run this script after any `pip install -r requirements.txt`.
+# Needs a C compiler plus the libjpeg and zlib headers (e.g. libjpeg-dev zlib1g-dev).
+set -eu
+
+PILLOW_SIMD_VERSION="9.5.0.post1"
+
+pip install -r requirements.txt
+pip uninstall -y pillow
+CC="cc -mavx2" pip install --no-cache-dir --no-binary pillow-simd "pillow-simd==${PILLOW_SIMD_VERSION}"